@@ -11,27 +11,34 @@ Features:
  - Optionally extract embedded images to a folder
  - Optionally remove blank pages
  - Re-write metadata if requested
- - Generate a JSON repair report
+ - Generate an NDJSON repair report, streamed while processing
 
 Usage:
-    python pdf_repair.py input.pdf -o repaired.pdf --ocr --extract-images out_images --dpi 300
+    python pdf_repair.py input.pdf -o repaired.pdf --ocr --extract-images out_images --ocr-dpi 200 --embed-dpi 300
 
 Notes:
- - Requires: PyMuPDF (fitz), Pillow, pytesseract
+ - Requires: PyMuPDF (fitz), Pillow, numpy, pytesseract
  - Tesseract OCR engine must be installed on your system and available in PATH
- - pip install pymupdf Pillow pytesseract
+ - pip install pymupdf Pillow numpy pytesseract
+ - Optional: numba (faster blank-page pre-screening)
+ - Optional: tesserocr (in-process Tesseract, used with --engine tesserocr)
+ - Optional: orjson (faster report writing)
 """
 
 import argparse
-import io
 import json
+import logging
 import os
+import shlex
 import shutil
 import sys
 import tempfile
+import time
 import datetime
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 try:
     import fitz  # PyMuPDF
@@ -45,56 +52,103 @@ except Exception:
     print("Missing dependency: Pillow. Install via `pip install Pillow`", file=sys.stderr)
     raise
 
+try:
+    import numpy as np
+except Exception:
+    print("Missing dependency: numpy. Install via `pip install numpy`", file=sys.stderr)
+    raise
+
+try:
+    from numba import njit
+except Exception:
+    njit = None  # JIT-compiled page statistics, optional (numpy fallback)
+
 try:
     import pytesseract
     from pytesseract import Output
 except Exception:
     pytesseract = None  # OCR optional
 
+try:
+    import tesserocr
+except Exception:
+    tesserocr = None  # in-process Tesseract API, optional
+
+try:
+    import orjson
+except Exception:
+    orjson = None  # faster report serialization, optional
+
+log = logging.getLogger("pdf_repair")
+
 # -------------------------
 # Helper: report object
 # -------------------------
+def now_utc() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
 def now_iso():
-    return datetime.datetime.utcnow().isoformat() + "Z"
+    return now_utc().isoformat().replace("+00:00", "Z")
 
 class RepairReport:
-    def __init__(self, input_path: Path):
-        self.data = {
-            "input_path": str(input_path),
-            "timestamp": now_iso(),
-            "actions": [],
-            "errors": [],
-            "pages": []
-        }
+    """
+    Repair report written incrementally as NDJSON (one JSON object per line):
+    a header record, then one record per action/error/page as they happen,
+    and a summary record written by finalize(). Nothing is buffered in memory.
+    Header and summary carry ISO timestamps; the high-frequency entries carry
+    "t_ns" (integer ns since the epoch, time.time_ns()) to avoid formatting a date per entry.
+    """
+    def __init__(self, input_path: Path, path: Path):
+        self.path = path
+        self.counts = {"actions": 0, "errors": 0, "pages": 0}
+        try:
+            ensure_output_parent(path)
+            self._fp = open(path, "w", encoding="utf-8", buffering=1 << 20)
+        except Exception as e:
+            log.error("Failed opening report: %s", e)
+            self._fp = None
+        self._write({"type": "header", "input_path": str(input_path), "timestamp": now_iso()})
+
+    def _write(self, record: dict):
+        if self._fp is None:
+            return
+        if orjson is not None:
+            self._fp.write(orjson.dumps(record, default=str).decode("utf-8") + "\n")
+        else:
+            self._fp.write(json.dumps(record, default=str) + "\n")
 
     def add_action(self, msg: str):
-        entry = {"time": now_iso(), "msg": msg}
-        self.data["actions"].append(entry)
-        print("[ACTION]", msg)
+        self.counts["actions"] += 1
+        self._write({"type": "action", "t_ns": time.time_ns(), "msg": msg})
+        log.info(msg)
 
     def add_error(self, msg: str):
-        entry = {"time": now_iso(), "msg": msg}
-        self.data["errors"].append(entry)
-        print("[ERROR]", msg, file=sys.stderr)
+        self.counts["errors"] += 1
+        self._write({"type": "error", "t_ns": time.time_ns(), "msg": msg})
+        log.error(msg)
 
     def add_page_entry(self, page_num: int, entry: dict):
-        # append or create page entry
-        entry_full = {"page": page_num, "time": now_iso(), **entry}
-        self.data["pages"].append(entry_full)
+        self.counts["pages"] += 1
+        self._write({"type": "page", "page": page_num, "t_ns": time.time_ns(), **entry})
 
-    def save(self, path: Path):
+    def finalize(self):
+        """Write the closing summary record and close the report file."""
+        if self._fp is None:
+            return
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, indent=2)
-            self.add_action(f"Saved JSON report to {path}")
+            self.add_action(f"Saved NDJSON report to {self.path}")
+            self._write({"type": "summary", "timestamp": now_iso(), **self.counts})
+            self._fp.close()
         except Exception as e:
-            print("Failed saving report:", e, file=sys.stderr)
+            log.error("Failed saving report: %s", e)
+        finally:
+            self._fp = None
 
 # -------------------------
 # Utilities
 # -------------------------
 def backup_file(src: Path, report: RepairReport) -> Path:
-    timestamp = datetime.datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    timestamp = now_utc().strftime("%Y%m%d%H%M%S")
     dst = src.with_name(src.stem + f".backup.{timestamp}" + src.suffix)
     shutil.copy2(src, dst)
     report.add_action(f"Backed up original to {dst}")
@@ -103,24 +157,42 @@ def backup_file(src: Path, report: RepairReport) -> Path:
 def ensure_output_parent(path: Path):
     path.parent.mkdir(parents=True, exist_ok=True)
 
+def save_options(compress_images: bool = True) -> dict:
+    """
+    Keyword arguments for fitz.Document.save: garbage collection + deflate, and by default
+    also (re)compress image and font streams and clean content streams in the same pass.
+    """
+    return dict(garbage=4, deflate=True, deflate_images=compress_images, deflate_fonts=compress_images,
+                clean=True, linear=False)
+
 # -------------------------
 # Core functions
 # -------------------------
-def try_simple_repair(input_path: Path, report: RepairReport) -> Path:
+def try_simple_repair(input_path: Path, report: RepairReport, force_resave: bool = False,
+                      compress_images: bool = True) -> Path:
     """
     Attempt to open and re-save the doc using PyMuPDF
     This often fixes xref and minor structural issues.
-    Returns path to intermediate repaired file.
+    Returns path to intermediate repaired file, or input_path itself when the document
+    already opens cleanly (the final save does the same cleanup) unless force_resave is set.
     """
     report.add_action("Attempting simple PyMuPDF open+save repair.")
     repaired = input_path.with_name(input_path.stem + ".resaved" + input_path.suffix)
     try:
+        fitz.TOOLS.mupdf_warnings(reset=True)
         doc = fitz.open(str(input_path))
         # read metadata
         meta = doc.metadata
         report.add_action(f"Original metadata: {meta}")
-        # Save with garbage=4 to do cleanup
-        doc.save(str(repaired), garbage=4, deflate=True)
+        warnings = fitz.TOOLS.mupdf_warnings(reset=True)
+        if not force_resave and not (doc.is_repaired or doc.needs_pass or warnings) and doc.xref_length() > 1:
+            doc.close()
+            report.add_action("Input opened cleanly; skipping intermediate resave.")
+            return input_path
+        if warnings:
+            report.add_action(f"MuPDF warnings on open: {warnings}")
+        # Save with garbage=4 (+ stream compression) to do cleanup
+        doc.save(str(repaired), **save_options(compress_images))
         doc.close()
         report.add_action(f"Saved intermediate repaired PDF to {repaired}")
         return repaired
@@ -134,67 +206,359 @@ def try_simple_repair(input_path: Path, report: RepairReport) -> Path:
                 pass
         raise
 
+def _write_bytes(path: Path, data: bytes) -> Path:
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
 def extract_images_from_doc(doc: fitz.Document, out_dir: Path, report: RepairReport) -> List[Path]:
     """
     Extract embedded images to out_dir. Returns list of saved image paths.
+    Images are deduplicated by xref, so an image reused across pages (logos, headers)
+    is decoded and written once, as img_<xref>.<ext>. File writes run on a small
+    thread pool so disk latency overlaps with decoding the next image.
     """
     saved = []
     out_dir.mkdir(parents=True, exist_ok=True)
     report.add_action(f"Extracting images to {out_dir}")
-    img_index = 0
-    for i in range(len(doc)):
-        page = doc[i]
-        image_list = page.get_images(full=True)
-        if not image_list:
+    pages_using = defaultdict(list)  # xref -> 1-based page numbers showing it
+    writes = []
+    with ThreadPoolExecutor(max_workers=4) as io_pool:
+        for i in range(len(doc)):
+            page = doc[i]
+            image_list = page.get_images(full=True)
+            if not image_list:
+                continue
+            for img in image_list:
+                xref = img[0]
+                seen = xref in pages_using
+                if i+1 not in pages_using[xref]:
+                    pages_using[xref].append(i+1)
+                if seen:
+                    continue
+                base_image = doc.extract_image(xref)
+                # stream bytes are written as-is (JPEG stays JPEG), no re-encode
+                image_bytes = base_image["image"]
+                ext = base_image.get("ext", "png")
+                fname = out_dir / f"img_{xref}.{ext}"
+                writes.append(io_pool.submit(_write_bytes, fname, image_bytes))
+    # leaving the with-block waited for all writes
+    for future in writes:
+        try:
+            fname = future.result()
+        except Exception as e:
+            report.add_error(f"Writing extracted image failed: {e}")
             continue
-        for img in image_list:
-            xref = img[0]
-            base_image = doc.extract_image(xref)
-            image_bytes = base_image["image"]
-            ext = base_image.get("ext", "png")
-            fname = out_dir / f"page{i+1}_img{img_index}.{ext}"
-            with open(fname, "wb") as f:
-                f.write(image_bytes)
-            saved.append(fname)
-            img_index += 1
-            report.add_action(f"Extracted image to {fname}")
+        saved.append(fname)
+        report.add_action(f"Extracted image to {fname}")
+    reused = {xref: pages for xref, pages in pages_using.items() if len(pages) > 1}
+    if reused:
+        report.add_action(f"Images reused across pages (xref -> pages): {reused}")
     report.add_action(f"Total images extracted: {len(saved)}")
     return saved
 
-def page_has_text(page: fitz.Page) -> bool:
-    """Return True if page has meaningful text (non-whitespace)."""
+def page_text(page: fitz.Page) -> str:
+    """Return the page's text layer ("" if it cannot be extracted)."""
     try:
-        txt = page.get_text("text")
-        if txt and txt.strip():
-            return True
-        return False
+        return page.get_text("text") or ""
     except Exception:
-        return False
+        return ""
+
+def _page_stats_numpy(buf):
+    return int(buf.min()), int(buf.max()), float(buf.mean()), float(buf.std())
+
+if njit is not None:
+    @njit(cache=True, nogil=True, fastmath=True)
+    def _page_stats(buf):
+        """Single pass over 8-bit samples -> (min, max, mean, std)."""
+        n = buf.size
+        if n == 0:
+            return 0, 0, 0.0, 0.0
+        mn, mx, s, s2 = 255, 0, 0, 0
+        for i in range(n):
+            b = np.int64(buf[i])
+            if b < mn:
+                mn = b
+            if b > mx:
+                mx = b
+            s += b
+            s2 += b * b
+        mean = s / n
+        var = s2 / n - mean * mean
+        return mn, mx, mean, np.sqrt(var) if var > 0 else 0.0
+else:
+    _page_stats = _page_stats_numpy
+
+def page_pixel_stats(page: fitz.Page, dpi: int = 72):
+    """Render the page to grayscale at dpi and return (min, max, mean, std) of its pixels."""
+    pix = page.get_pixmap(dpi=dpi, alpha=False, colorspace=fitz.csGRAY)
+    return _page_stats(np.frombuffer(pix.samples, dtype=np.uint8))
+
+def _is_blank_page(page: fitz.Page, thresh: float = 2.0) -> bool:
+    """
+    Return True if the rendered page is visually uniform (no ink).
+    Works for image-only and OCR'd pages, whose text layer says nothing about their content.
+    """
+    return page_pixel_stats(page)[3] < thresh
+
+def _is_uniform_page(page: fitz.Page, max_std: float = 3.0) -> bool:
+    """Return True for pure white or pure black pages, which have nothing to OCR."""
+    _, _, mean, std = page_pixel_stats(page)
+    return std < max_std and (mean > 250 or mean < 5)
+
+def render_page_for_ocr(page: fitz.Page, dpi: int, rgb: bool = False) -> Image.Image:
+    """
+    Render the page straight to grayscale (Tesseract converts to gray internally anyway)
+    and wrap the raw samples for Pillow instead of a PNG encode/decode round-trip.
+    rgb=True keeps colour for scripts where grayscale hurts recognition.
+    This render is only used for recognition; the output keeps the original page
+    (see insert_ocr_page).
+    """
+    mode = "RGB" if rgb else "L"
+    pix = page.get_pixmap(dpi=dpi, alpha=False, colorspace=fitz.csRGB if rgb else fitz.csGRAY)
+    return Image.frombuffer(mode, (pix.width, pix.height), pix.samples, "raw", mode, 0, 1)
 
-def ocr_page_to_pdf_bytes(page: fitz.Page, dpi: int = 300, lang: str = "eng") -> bytes:
+def resolve_ocr_engine(engine: str = "pytesseract") -> str:
+    """
+    Return the OCR engine that will actually be used for the requested one:
+    tesserocr falls back to pytesseract when it is not installed. Returns None if no engine is available.
+    """
+    if engine == "tesserocr" and tesserocr is not None:
+        return "tesserocr"
+    return "pytesseract" if pytesseract is not None else None
+
+# default Tesseract options: LSTM engine, one uniform text block
+# (skips the auto-segmentation / orientation pass) and no inverted-text retry
+DEFAULT_TESS_CONFIG = "--oem 1 --psm 6 -c tessedit_do_invert=0"
+
+def parse_tess_config(config: str):
+    """Split a Tesseract command-line config into tesserocr init kwargs, -c variables and ignored options."""
+    init_kwargs, variables, ignored = {}, {}, []
+    tokens = shlex.split(config or "")
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        value = tokens[i + 1] if i + 1 < len(tokens) else None
+        if tok in ("--psm", "--oem") and value is not None and value.isdigit():
+            init_kwargs[tok[2:]] = int(value)
+            i += 2
+        elif tok == "--tessdata-dir" and value is not None:
+            init_kwargs["path"] = value
+            i += 2
+        elif tok == "-c" and value is not None and "=" in value:
+            name, val = value.split("=", 1)
+            variables[name] = val
+            i += 2
+        elif tok.startswith("-c") and "=" in tok[2:]:
+            name, val = tok[2:].split("=", 1)
+            variables[name] = val
+            i += 1
+        else:
+            ignored.append(tok)
+            i += 1
+    return init_kwargs, variables, ignored
+
+# one tesserocr API per (worker) process, language and config, so traineddata is loaded once instead of per page
+_TESSEROCR_APIS = {}
+
+def _tesserocr_api(lang: str, config: str = DEFAULT_TESS_CONFIG):
+    api = _TESSEROCR_APIS.get((lang, config))
+    if api is None:
+        init_kwargs, variables, _ = parse_tess_config(config)
+        init_kwargs.setdefault("psm", tesserocr.PSM.AUTO)
+        init_kwargs.setdefault("oem", tesserocr.OEM.LSTM_ONLY)
+        api = tesserocr.PyTessBaseAPI(lang=lang, **init_kwargs)
+        for name, val in variables.items():
+            if not api.SetVariable(name, val):
+                log.warning("tesserocr: unknown Tesseract variable %s", name)
+        api.SetVariable("tessedit_create_pdf", "1")
+        api.SetVariable("textonly_pdf", "1")
+        _TESSEROCR_APIS[(lang, config)] = api
+    return api
+
+def _tesserocr_ocr(img: Image.Image, dpi: int, lang: str, config: str = DEFAULT_TESS_CONFIG):
+    """
+    Run the persistent tesserocr API on img once and return (searchable PDF page bytes,
+    mean word confidence); the confidence is read from the same recognition.
+    """
+    api = _tesserocr_api(lang, config)
+    api.SetVariable("user_defined_dpi", str(dpi))  # before recognition, not left over from the last page
+    with tempfile.TemporaryDirectory() as tmp:
+        outputbase = os.path.join(tmp, "page")
+        if not api.ProcessPage(outputbase, img, 0, "page"):
+            raise RuntimeError("tesserocr failed to OCR page")
+        conf = float(api.MeanTextConf())
+        with open(outputbase + ".pdf", "rb") as f:
+            return f.read(), conf
+
+def mean_ocr_confidence(img: Image.Image, lang: str = "eng", engine: str = "pytesseract",
+                        config: str = DEFAULT_TESS_CONFIG, dpi: Optional[int] = None) -> float:
+    """Return Tesseract's mean word confidence (0-100) for img rendered at dpi, ignoring non-word boxes."""
+    if engine == "tesserocr":
+        api = _tesserocr_api(lang, config)
+        if dpi is not None:
+            api.SetVariable("user_defined_dpi", str(dpi))
+        api.SetImage(img)
+        return float(api.MeanTextConf())
+    if dpi is not None:
+        config = f"--dpi {dpi} {config}".strip()
+    data = pytesseract.image_to_data(img, output_type=Output.DICT, lang=lang, config=config)
+    confs = [float(c) for c in data.get("conf", []) if float(c) > 0]
+    return sum(confs) / len(confs) if confs else 0.0
+
+def ocr_page_to_pdf_bytes(page: fitz.Page, dpi: int = 300, lang: str = "eng",
+                          adaptive: bool = False, adaptive_dpi: int = 200, min_conf: float = 70.0,
+                          rgb: bool = False, engine: str = "pytesseract",
+                          config: str = DEFAULT_TESS_CONFIG) -> Optional[bytes]:
     """
-    Render the page to an image (Pillow) and run pytesseract to produce a searchable PDF page (bytes).
-    Returns PDF bytes produced by tesseract's PDF engine.
+    Render the page to an image (Pillow) and run Tesseract to produce the page's text layer.
+    Returns a text-only PDF page (invisible text, no image; textonly_pdf=1) produced by
+    tesseract's PDF engine, via pytesseract (one subprocess per page)
+    or tesserocr (persistent in-process API), or None for pure white/black pages, which are not OCR'd.
+    With adaptive=True the page is first tried at adaptive_dpi and only re-rendered at dpi
+    when the mean OCR confidence falls below min_conf.
+    config holds extra Tesseract command-line options; for tesserocr only --psm, --oem,
+    --tessdata-dir and -c VAR=VALUE are applied.
     """
-    if pytesseract is None:
+    engine = resolve_ocr_engine(engine)
+    if engine is None:
         raise RuntimeError("pytesseract not available for OCR fallback")
 
-    # Render page
-    mat = fitz.Matrix(dpi/72, dpi/72)  # scale
-    pix = page.get_pixmap(matrix=mat, alpha=False)  # RGB
-    img_bytes = pix.tobytes("png")
-    img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-    # pytesseract can produce pdf bytes
-    pdf_bytes = pytesseract.image_to_pdf_or_hocr(img, extension='pdf', lang=lang)
-    return pdf_bytes
+    # cheap low-res pre-screen: don't spend Tesseract time on pages without any ink
+    if _is_uniform_page(page):
+        return None
 
-def build_repaired_pdf(input_pdf_path: Path, output_pdf_path: Path, use_ocr: bool, dpi: int,
+    img = None
+    try:
+        if adaptive and adaptive_dpi < dpi:
+            img = render_page_for_ocr(page, adaptive_dpi, rgb=rgb)
+            if engine == "tesserocr":
+                # one recognition gives both the PDF and its confidence
+                pdf_bytes, conf = _tesserocr_ocr(img, adaptive_dpi, lang, config)
+                if conf >= min_conf:
+                    return pdf_bytes
+            elif mean_ocr_confidence(img, lang=lang, engine=engine, config=config, dpi=adaptive_dpi) >= min_conf:
+                dpi = adaptive_dpi  # good enough -> reuse the low-res render
+            if dpi > adaptive_dpi:
+                img.close()  # re-render at full dpi; drop the low-res raster first
+                img = None
+        if img is None:
+            img = render_page_for_ocr(page, dpi, rgb=rgb)
+        if engine == "tesserocr":
+            return _tesserocr_ocr(img, dpi, lang, config)[0]
+        # pytesseract can produce pdf bytes; pass the render dpi so the output page keeps its original size
+        pdf_bytes = pytesseract.image_to_pdf_or_hocr(img, extension='pdf', lang=lang,
+                                                     config=f"--dpi {dpi} -c textonly_pdf=1 {config}".strip())
+        return pdf_bytes
+    finally:
+        # release the page raster right away instead of whenever the next page replaces it
+        if img is not None:
+            img.close()
+
+def _ocr_page_worker(pdf_path: str, page_index: int, dpi: int, lang: str, adaptive: bool = False,
+                     adaptive_dpi: int = 200,
+                     rgb: bool = False, engine: str = "pytesseract",
+                     config: str = DEFAULT_TESS_CONFIG) -> Optional[bytes]:
+    """
+    Process-pool entry point: OCR a single page of pdf_path and return the PDF bytes (None if skipped).
+    The document is opened inside the worker because fitz.Document objects cannot be shared across processes.
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        return ocr_page_to_pdf_bytes(doc[page_index], dpi=dpi, lang=lang, adaptive=adaptive,
+                                     adaptive_dpi=adaptive_dpi, rgb=rgb,
+                                     engine=engine, config=config)
+    except Exception as e:
+        # re-raise as a plain RuntimeError: some pytesseract exceptions cannot be unpickled
+        # in the parent process, which would break the whole pool instead of failing one page
+        raise RuntimeError(str(e)) from None
+    finally:
+        doc.close()
+
+def insert_ocr_page(new_doc: fitz.Document, src_doc: fitz.Document, page_index: int,
+                    text_doc: fitz.Document, text_pno: int):
+    """
+    Append the original page page_index of src_doc to new_doc with Tesseract's invisible
+    text layer (page text_pno of text_doc, a text-only PDF page) laid over it.
+    The scan keeps its own image stream (JPEG, colour) instead of being re-rendered.
+    """
+    new_doc.insert_pdf(src_doc, from_page=page_index, to_page=page_index)
+    try:
+        new_page = new_doc[-1]
+        new_page.show_pdf_page(new_page.rect, text_doc, text_pno)
+    except Exception:
+        new_doc.delete_page(-1)  # don't leave a half-built page behind for the fallback
+        raise
+
+def merge_ocr_pdfs(pieces: list, report: RepairReport):
+    """
+    Concatenate Tesseract's per-page PDFs into one fitz document.
+    pieces is a list of (source page index, pdf bytes). Returns (doc, slots, errors) where
+    slots maps source page index -> (first, last) page in doc and errors maps index -> exception.
+    Every piece is opened and inserted on its own, which isolates a bad piece to its own page.
+    """
+    doc = fitz.open()  # empty
+    slots, errors = {}, {}
+    for i, pdf_bytes in pieces:
+        try:
+            temp_pdf = fitz.open("pdf", pdf_bytes)
+            try:
+                slots[i] = (len(doc), len(doc) + len(temp_pdf) - 1)
+                doc.insert_pdf(temp_pdf)
+            finally:
+                temp_pdf.close()
+        except Exception as e:
+            slots.pop(i, None)
+            errors[i] = e
+    if slots:
+        report.add_action(f"Merged {len(slots)} OCR page(s)")
+    return doc, slots, errors
+
+def flush_copy_run(new_doc: fitz.Document, src_doc: fitz.Document, copy_run: list, report: RepairReport):
+    """
+    Insert a run of consecutive source pages into new_doc with a single insert_pdf call
+    (one page-tree walk / xref update instead of one per page), record their page entries
+    and empty the run. If the range insert fails, the run is retried page by page so only
+    the pages that actually fail are lost.
+    """
+    if not copy_run:
+        return
+    first, last = copy_run[0][0], copy_run[-1][0]
+    pages_before = len(new_doc)
+    try:
+        new_doc.insert_pdf(src_doc, from_page=first, to_page=last)
+    except Exception as e:
+        report.add_error(f"Copying pages {first+1}-{last+1} failed, retrying page by page: {e}")
+        # drop whatever part of the range made it in before the failure
+        while len(new_doc) > pages_before:
+            new_doc.delete_page(-1)
+        for i, page_info in copy_run:
+            try:
+                new_doc.insert_pdf(src_doc, from_page=i, to_page=i)
+            except Exception as e2:
+                page_info["copy_error"] = str(e2)
+                report.add_error(f"Copying page {i+1} failed: {e2}")
+    for i, page_info in copy_run:
+        report.add_page_entry(i+1, page_info)
+    copy_run.clear()
+
+def build_repaired_pdf(input_pdf_path: Path, output_pdf_path: Path, use_ocr: bool, ocr_dpi: int, embed_dpi: int,
                        extract_images: bool, out_images_dir: Path, remove_blank: bool,
-                       ocr_lang: str, report: RepairReport) -> None:
+                       ocr_lang: str, report: RepairReport, workers: int = None,
+                       adaptive_dpi: bool = False, rgb_ocr: bool = False,
+                       ocr_engine: str = "pytesseract", compress_images: bool = True,
+                       tess_config: str = DEFAULT_TESS_CONFIG) -> None:
     """
     Main orchestration:
     - open source doc
-    - iterate pages: if page has text -> append original page; else -> OCR to PDF page and append
+    - scan pages for text and dispatch OCR of text-less pages to a process pool
+    - merge the OCR results into a single intermediate document
+    - ocr_dpi is the resolution Tesseract sees; embed_dpi is the resolution of pages inserted
+      as images (OCR'd pages keep the original page with the text layer laid over it).
+      With adaptive_dpi, pages whose OCR confidence at ocr_dpi is low are re-OCR'd at embed_dpi
+      (only if embed_dpi is higher; otherwise pages are OCR'd once at ocr_dpi).
+    - iterate pages: if page has text -> append original page (runs of such pages in one insert);
+      else -> append OCR'd PDF page
     - optionally extract images
     - save final PDF
     """
@@ -208,39 +572,107 @@ def build_repaired_pdf(input_pdf_path: Path, output_pdf_path: Path, use_ocr: boo
         except Exception as e:
             report.add_error(f"Image extraction failed: {e}")
 
+    # cheap first pass: find pages that need OCR so they can be processed in parallel
+    # (get_text re-parses the content stream, so it is called exactly once per page)
+    text_chars = []  # per page: length of the text layer, 0 when it has no meaningful text
+    for i in range(len(src_doc)):
+        txt = page_text(src_doc[i])
+        text_chars.append(len(txt) if txt.strip() else 0)
+    text_pages = [n > 0 for n in text_chars]
+    ocr_futures = {}
+    executor = None
+    engine = resolve_ocr_engine(ocr_engine) if use_ocr else None
+    if engine is not None and engine != ocr_engine:
+        report.add_action(f"OCR engine {ocr_engine} not available; using {engine}")
+    if engine == "tesserocr":
+        ignored = parse_tess_config(tess_config)[2]
+        if ignored:
+            report.add_action(f"tesserocr ignores Tesseract option(s): {' '.join(ignored)}")
+    if engine is not None and not all(text_pages):
+        # the adaptive retry only helps when it is at a higher resolution than the first try
+        adaptive = adaptive_dpi and ocr_dpi < embed_dpi
+        if adaptive_dpi and not adaptive:
+            report.add_action(f"--ocr-dpi {ocr_dpi} is not below --embed-dpi {embed_dpi}; "
+                              f"OCR runs once at {ocr_dpi} dpi without adaptive retry")
+        max_workers = workers or os.cpu_count()
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        for i, text_ok in enumerate(text_pages):
+            if not text_ok:
+                ocr_futures[i] = executor.submit(_ocr_page_worker, str(input_pdf_path), i,
+                                                 embed_dpi if adaptive else ocr_dpi, ocr_lang,
+                                                 adaptive=adaptive, adaptive_dpi=ocr_dpi,
+                                                 rgb=rgb_ocr, engine=engine,
+                                                 config=tess_config)
+        report.add_action(f"Dispatched {len(ocr_futures)} page(s) for OCR to {max_workers} worker(s)")
+
+    # merge all OCR results into one document (in page order) so the assembly pass below
+    # inserts every OCR page from a single source instead of a fresh document per page
+    ocr_pieces = []  # (source page index, Tesseract PDF bytes) in page order
+    ocr_errors = {}  # source page index -> exception
+    ocr_skipped = set()  # source page indexes found blank/black by the pre-screen
+    for i, future in ocr_futures.items():
+        try:
+            pdf_bytes = future.result()
+        except Exception as e:
+            ocr_errors[i] = e
+            continue
+        if pdf_bytes is None:
+            ocr_skipped.add(i)
+        else:
+            ocr_pieces.append((i, pdf_bytes))
+    if executor is not None:
+        executor.shutdown()
+    ocr_doc, ocr_slots, merge_errors = merge_ocr_pdfs(ocr_pieces, report)
+    ocr_errors.update(merge_errors)
+    ocr_pieces.clear()  # the raw Tesseract outputs now live in ocr_doc
+
     # new doc to accumulate pages
     new_doc = fitz.open()  # empty
+    copy_run = []  # (page index, page info) of consecutive text pages not yet inserted
 
     for i in range(len(src_doc)):
         try:
             page = src_doc[i]
             page_info = {"page_index": i+1}
-            text_ok = page_has_text(page)
+            text_ok = text_pages[i]
             if text_ok:
-                # Append the original page by inserting that single page
-                new_doc.insert_pdf(src_doc, from_page=i, to_page=i)
+                # Queue the original page; consecutive text pages are inserted as one range
                 page_info["action"] = "copied"
-                page_info["text_chars"] = len(page.get_text("text") or "")
+                page_info["text_chars"] = text_chars[i]
                 report.add_action(f"Page {i+1}: copied (has text)")
+                copy_run.append((i, page_info))
+                continue
             else:
+                flush_copy_run(new_doc, src_doc, copy_run, report)
+                pages_before = len(new_doc)
                 page_info["action"] = "no_text"
                 report.add_action(f"Page {i+1}: no text detected")
                 if use_ocr:
                     try:
-                        pdf_bytes = ocr_page_to_pdf_bytes(page, dpi=dpi, lang=ocr_lang)
-                        temp_pdf = fitz.open("pdf", pdf_bytes)
-                        # insert pdf page(s) - usually one
-                        new_doc.insert_pdf(temp_pdf)
-                        page_info["ocr"] = "applied"
-                        report.add_action(f"Page {i+1}: OCR applied and page inserted (dpi={dpi})")
+                        if i in ocr_skipped:
+                            # nothing to recognise: keep the original page as-is
+                            new_doc.insert_pdf(src_doc, from_page=i, to_page=i)
+                            page_info["ocr"] = "skipped_uniform"
+                            report.add_action(f"Page {i+1}: blank/black page, OCR skipped")
+                        elif i not in ocr_slots:
+                            raise ocr_errors.get(i) or RuntimeError("pytesseract not available for OCR fallback")
+                        else:
+                            # original page + OCR text layer (Tesseract emits one page per image)
+                            first, _ = ocr_slots[i]
+                            insert_ocr_page(new_doc, src_doc, i, ocr_doc, first)
+                            page_info["ocr"] = "applied"
+                            report.add_action(f"Page {i+1}: OCR applied and page inserted")
                     except Exception as e:
                         page_info["ocr"] = f"failed: {e}"
                         report.add_error(f"Page {i+1} OCR failed: {e}")
                         # fallback: insert rendered image as page
                         try:
-                            mat = fitz.Matrix(dpi/72, dpi/72)
-                            pix = page.get_pixmap(matrix=mat, alpha=False)
-                            img_xref = new_doc.insert_image(new_doc.new_page(width=pix.width, height=pix.height).rect, stream=pix.tobytes("png"))
+                            pix = page.get_pixmap(dpi=embed_dpi, alpha=False)
+                            try:
+                                new_page = new_doc.new_page(width=page.rect.width, height=page.rect.height)
+                                new_page.insert_image(new_page.rect, pixmap=pix)
+                            finally:
+                                pix = None  # free the raster now, not when the next page reassigns it
                             # We inserted page already as image; mark
                             page_info["fallback_image_inserted"] = True
                             report.add_action(f"Page {i+1}: fallback image-insert used")
@@ -250,22 +682,24 @@ def build_repaired_pdf(input_pdf_path: Path, output_pdf_path: Path, use_ocr: boo
                 else:
                     # No OCR: we can insert an image version to preserve visual content
                     try:
-                        mat = fitz.Matrix(dpi/72, dpi/72)
-                        pix = page.get_pixmap(matrix=mat, alpha=False)
-                        new_page = new_doc.new_page(width=pix.width, height=pix.height)
-                        new_page.insert_image(new_page.rect, stream=pix.tobytes("png"))
+                        pix = page.get_pixmap(dpi=embed_dpi, alpha=False)
+                        try:
+                            new_page = new_doc.new_page(width=page.rect.width, height=page.rect.height)
+                            new_page.insert_image(new_page.rect, pixmap=pix)
+                        finally:
+                            pix = None  # free the raster now, not when the next page reassigns it
                         page_info["image_inserted"] = True
                         report.add_action(f"Page {i+1}: inserted as image (no OCR mode)")
                     except Exception as e:
                         page_info["image_error"] = str(e)
                         report.add_error(f"Page {i+1} image insertion failed: {e}")
             # decide to drop blank pages if requested
-            if remove_blank:
-                # after insertion, check the last page of new_doc for text
+            # (copied pages are known to have text, and nothing to check if no page was inserted)
+            if remove_blank and len(new_doc) > pages_before:
+                # after insertion, check whether the last page of new_doc renders blank
                 last_page = new_doc[-1]
                 try:
-                    last_text = last_page.get_text("text") or ""
-                    if not last_text.strip():
+                    if _is_blank_page(last_page):
                         # consider blank -> remove
                         new_doc.delete_page(-1)
                         page_info["removed_blank"] = True
@@ -280,6 +714,7 @@ def build_repaired_pdf(input_pdf_path: Path, output_pdf_path: Path, use_ocr: boo
         except Exception as e:
             report.add_error(f"Processing page {i+1} failed: {e}")
             # continue with next page
+    flush_copy_run(new_doc, src_doc, copy_run, report)
 
     # metadata handling - copy original metadata and allow some sanity repair
     try:
@@ -302,13 +737,14 @@ def build_repaired_pdf(input_pdf_path: Path, output_pdf_path: Path, use_ocr: boo
     try:
         ensure_output_parent(output_pdf_path)
         # Use garbage cleanup to attempt final repair
-        new_doc.save(str(output_pdf_path), garbage=4, deflate=True)
+        new_doc.save(str(output_pdf_path), **save_options(compress_images))
         report.add_action(f"Saved final repaired PDF to {output_pdf_path}")
     except Exception as e:
         report.add_error(f"Failed saving final PDF: {e}")
         raise
     finally:
         src_doc.close()
+        ocr_doc.close()
         new_doc.close()
 
 # -------------------------
@@ -319,23 +755,53 @@ def parse_args():
     p.add_argument("input", type=str, help="Input PDF path")
     p.add_argument("-o", "--output", type=str, default=None, help="Output repaired PDF path")
     p.add_argument("--ocr", action="store_true", help="Use OCR fallback for pages with no text (requires Tesseract)")
-    p.add_argument("--dpi", type=int, default=300, help="DPI for rendering pages for OCR (default 300)")
+    p.add_argument("--ocr-dpi", type=int, default=200, help="DPI of the page renders fed to Tesseract (default 200)")
+    p.add_argument("--embed-dpi", type=int, default=300,
+                   help="DPI of pages inserted as images when not OCR'd (default 300)")
+    p.add_argument("--dpi", type=int, default=None,
+                   help="Shorthand setting both --ocr-dpi and --embed-dpi (with --adaptive-dpi only --embed-dpi, "
+                        "so pages are still tried at --ocr-dpi first)")
     p.add_argument("--extract-images", type=str, default=None, help="Directory to save extracted images")
     p.add_argument("--remove-blank", action="store_true", help="Remove pages that remain blank after processing")
     p.add_argument("--ocr-lang", type=str, default="eng", help="Tesseract OCR language (default eng)")
-    p.add_argument("--report", type=str, default=None, help="Path to save JSON repair report (default: <input>.repair_report.json)")
-    return p.parse_args()
+    p.add_argument("--adaptive-dpi", action="store_true",
+                   help="Re-OCR pages at --embed-dpi when Tesseract confidence at --ocr-dpi is low")
+    p.add_argument("--rgb-ocr", action="store_true",
+                   help="Feed Tesseract RGB renders instead of grayscale (for scripts where gray hurts accuracy)")
+    p.add_argument("--engine", choices=["pytesseract", "tesserocr"], default="pytesseract",
+                   help="OCR backend: pytesseract (Tesseract subprocess per page) or tesserocr "
+                        "(in-process API kept open per worker; falls back to pytesseract if not installed)")
+    p.add_argument("--tess-config", type=str, default=DEFAULT_TESS_CONFIG,
+                   help=f'Extra Tesseract options (default "{DEFAULT_TESS_CONFIG}"; pass "" for Tesseract defaults; '
+                        'tesserocr applies --psm, --oem, --tessdata-dir and -c only)')
+    p.add_argument("--workers", type=int, default=None, help="Number of parallel OCR worker processes (default: CPU count)")
+    p.add_argument("--force-resave", action="store_true",
+                   help="Always write the intermediate re-saved PDF, even when the input opens cleanly")
+    p.add_argument("--no-compress-images", action="store_true",
+                   help="Do not deflate image and font streams when saving")
+    p.add_argument("-q", "--quiet", action="store_true", help="Only log errors (per-page actions are still in the report)")
+    p.add_argument("--report", type=str, default=None, help="Path to save NDJSON repair report (default: <input>.repair_report.ndjson)")
+    args = p.parse_args()
+    if args.dpi is not None:
+        args.embed_dpi = args.dpi
+        if not args.adaptive_dpi:
+            args.ocr_dpi = args.dpi
+    if args.workers is not None and args.workers < 1:
+        p.error("--workers must be at least 1")
+    return args
 
 def main():
     args = parse_args()
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
     inp = Path(args.input)
     if not inp.exists():
         print("Input file not found:", inp, file=sys.stderr)
         sys.exit(2)
 
     out = Path(args.output) if args.output else inp.with_name(inp.stem + ".repaired" + inp.suffix)
-    report_path = Path(args.report) if args.report else inp.with_suffix(".repair_report.json")
-    report = RepairReport(inp)
+    report_path = Path(args.report) if args.report else inp.with_suffix(".repair_report.ndjson")
+    report = RepairReport(inp, report_path)
 
     # backup
     try:
@@ -345,7 +811,8 @@ def main():
 
     # try simple resave repair first
     try:
-        intermediate = try_simple_repair(inp, report)
+        intermediate = try_simple_repair(inp, report, force_resave=args.force_resave,
+                                         compress_images=not args.no_compress_images)
         working_input = intermediate
     except Exception:
         # fallback to original file if simple repair failed
@@ -355,17 +822,17 @@ def main():
     # open working input and build repaired doc
     try:
         out_images_dir = Path(args.extract_images) if args.extract_images else None
-        build_repaired_pdf(working_input, out, use_ocr=args.ocr, dpi=args.dpi,
+        build_repaired_pdf(working_input, out, use_ocr=args.ocr, ocr_dpi=args.ocr_dpi, embed_dpi=args.embed_dpi,
                            extract_images=bool(out_images_dir), out_images_dir=out_images_dir or Path("."),
-                           remove_blank=args.remove_blank, ocr_lang=args.ocr_lang, report=report)
+                           remove_blank=args.remove_blank, ocr_lang=args.ocr_lang, report=report,
+                           workers=args.workers, adaptive_dpi=args.adaptive_dpi, rgb_ocr=args.rgb_ocr,
+                           ocr_engine=args.engine, compress_images=not args.no_compress_images,
+                           tess_config=args.tess_config)
     except Exception as e:
         report.add_error(f"Overall repair failed: {e}")
 
-    # save report
-    try:
-        report.save(report_path)
-    except Exception as e:
-        print("Failed to save report:", e, file=sys.stderr)
+    # finish report
+    report.finalize()
 
     print("Repair complete. Report saved to", report_path)
     print("Output:", out)